@@ -1,430 +1,656 @@
-
-import streamlit as st
-import pandas as pd
-import plotly.express as px
-import time
-import os
-import json
-from typing import Dict, Any
-
-# Third-party dependencies that must appear in requirements.txt
-from st_aggrid import AgGrid, GridUpdateMode, DataReturnMode
-import gspread
-from google.oauth2.service_account import Credentials
-
-# ------------------------------
-# CONFIG / CONSTANTS
-# ------------------------------
-SHEET_ID = "1IHHtOFCFs6SdE88L3ZrUfbg_rmXgF8kHrhbmE4Yk3Y0"
-WORKSHEET_NAME = "GX Dashboard Data"
-
-DEFAULT_DATA = {
-    "hcp_educated": 28, "hcp_family": 19, "hcp_internal": 18, "hcp_general": 28,
-    "hcp_md_do": 75, "hcp_np_pa": 25,
-    "confidence_diagnosing": 85, "confidence_treating": 78, "confidence_managing": 82,
-    "intent_to_test": 90,
-    "attendees_educated": 98,
-    "demo_black": 55, "demo_hispanic": 25, "demo_white": 17, "demo_other": 3,
-    "age_55_plus": 45, "age_35_54": 28, "age_18_34": 27,
-    "gender_male": 75,
-    "aware_ldlc": 88, "understand_risk": 84, "intent_test": 91, "intent_followup": 79,
-    "ldlc_0_54": 0.54, "ldlc_55_70": 0.70, "ldlc_70_99": 0.99,
-    "ldlc_100_139": 1.39, "ldlc_140_189": 1.89, "ldlc_190_plus": 1.90,
-}
-
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
-
-# ------------------------------
-# AUTH / GSPREAD HELPERS
-# ------------------------------
-
-def _creds_from_st_secrets() -> Credentials | None:
-    """Return google Credentials object from st.secrets if available."""
-    try:
-        if "gcp_service_account" in st.secrets:
-            sa = st.secrets["gcp_service_account"]
-            # st.secrets might return a TOML-like mapping or a JSON string
-            if isinstance(sa, str):
-                sa = json.loads(sa)
-            creds = Credentials.from_service_account_info(sa, scopes=SCOPES)
-            return creds
-    except Exception as e:
-        st.error(f"Error parsing st.secrets gcp_service_account: {e}")
-    return None
-
-
-def _creds_from_file_env() -> Credentials | None:
-    """Try loading credentials from GOOGLE_APPLICATION_CREDENTIALS env var or local file.
-    Returns None if no usable file was found.
-    """
-    json_path = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS", "service_account.json")
-    if not os.path.exists(json_path):
-        return None
-    try:
-        creds = Credentials.from_service_account_file(json_path, scopes=SCOPES)
-        return creds
-    except Exception as e:
-        st.error(f"Failed loading credentials from file {json_path}: {e}")
-        return None
-
-
-def get_gspread_client() -> gspread.Client:
-    """Return an authorized gspread client.
-
-    Priority:
-    1) st.secrets['gcp_service_account'] (recommended for Streamlit Cloud)
-    2) GOOGLE_APPLICATION_CREDENTIALS env var or service_account.json (local/dev)
-    """
-    # 1) try st.secrets
-    creds = _creds_from_st_secrets()
-    if creds is not None:
-        return gspread.authorize(creds)
-
-    # 2) try env / local file
-    creds = _creds_from_file_env()
-    if creds is not None:
-        return gspread.authorize(creds)
-
-    # 3) nothing worked
-    raise RuntimeError("No Google service account credentials found. Add credentials to st.secrets or set GOOGLE_APPLICATION_CREDENTIALS to a local JSON file.")
-
-# ------------------------------
-# DATA IO
-# ------------------------------
-
-@st.cache_data(ttl=60)
-def load_data_from_sheet() -> Dict[str, Any]:
-    """Load key/value pairs from Google Sheet. Cached for 60 seconds.
-
-    Returns DEFAULT_DATA copy on errors.
-    """
-    try:
-        client = get_gspread_client()
-        sh = client.open_by_key(SHEET_ID)
-        ws = sh.worksheet(WORKSHEET_NAME)
-        rows = ws.get_all_values()  # returns list of lists
-        # Expect header row: [key, value]
-        if len(rows) < 2:
-            return DEFAULT_DATA.copy()
-
-        data: Dict[str, Any] = {}
-        for row in rows[1:]:
-            if len(row) < 2:
-                continue
-            key = row[0]
-            val = row[1]
-            if key == "":
-                continue
-            # try converting numeric values
-            try:
-                if val is None or val == "":
-                    parsed = ""
-                elif isinstance(val, (int, float)):
-                    parsed = val
-                elif "." in val:
-                    parsed = float(val)
-                else:
-                    parsed = int(val)
-            except Exception:
-                parsed = val
-            data[key] = parsed
-        # combine with defaults for missing keys
-        out = DEFAULT_DATA.copy()
-        out.update(data)
-        return out
-    except Exception as e:
-        st.error(f"⚠️ Could not load data from Google Sheets: {e}")
-        return DEFAULT_DATA.copy()
-
-
-def save_data_to_sheet(data: Dict[str, Any]) -> bool:
-    """Save the provided dict to Google Sheet as two-column rows (key, value).
-
-    This function writes all rows in a single batch update for speed.
-    Returns True on success, False on failure.
-    """
-    try:
-        client = get_gspread_client()
-        sh = client.open_by_key(SHEET_ID)
-        ws = sh.worksheet(WORKSHEET_NAME)
-        rows = [["key", "value"]]
-        for k, v in data.items():
-            rows.append([k, str(v)])
-        # Write starting from A1
-        ws.clear()
-        ws.update("A1", rows)
-        # Invalidate cache
-        load_data_from_sheet.clear()
-        return True
-    except Exception as e:
-        st.error(f"⚠️ Could not save data to Google Sheets: {e}")
-        return False
-
-# ------------------------------
-# UI HELPERS
-# ------------------------------
-
-def render_metric_card(label: str, value: Any, color: str = "#1f77b4", bg_color: str = "#f0f8ff"):
-    st.markdown(f"""
-        <div style='text-align:center; background-color:{bg_color}; border-radius:12px; padding:14px; margin:8px 0; min-height:120px; display:flex; flex-direction:column; justify-content:center; align-items:center;'>
-            <div style='font-size:13px; color:#444; font-weight:600; margin-bottom:6px;'>{label}</div>
-            <div style='font-size:32px; font-weight:bold; color:{color};'>{value}%</div>
-        </div>
-    """, unsafe_allow_html=True)
-
-# ------------------------------
-# SECTION RENDERS
-# ------------------------------
-
-def render_hcp_section(data: Dict[str, Any]):
-    st.markdown("### TOTAL HCPs EDUCATED in GX")
-    hcp_val = int(float(data.get("hcp_educated", 0)))
-    new_hcp = st.number_input("Running Total", min_value=0, value=hcp_val, key="hcp_educated_input")
-    if st.session_state.get("hcp_educated_input") != hcp_val:
-        st.session_state.modified = True
-    c1, c2, c3, c4 = st.columns(4)
-    with c1: render_metric_card("Confidence<br>Diagnosing", int(float(data.get("confidence_diagnosing", 0))), "#1f77b4", "#f0f8ff")
-    with c2: render_metric_card("Confidence<br>Treating", int(float(data.get("confidence_treating", 0))), "#ff7f0e", "#fff8f0")
-    with c3: render_metric_card("Confidence<br>Managing", int(float(data.get("confidence_managing", 0))), "#2ca02c", "#f0fff0")
-    with c4: render_metric_card("Intent<br>to Test", int(float(data.get("intent_to_test", 0))), "#d62728", "#fff0f0")
-
-    st.markdown("#### Practice Type")
-    cols = st.columns(3)
-    keys = ["hcp_family", "hcp_internal", "hcp_general"]
-    practice_vals = {}
-    for key, col in zip(keys, cols):
-        with col:
-            val = int(float(data.get(key, 0)))
-            practice_vals[key] = st.number_input(key.replace("hcp_", "").capitalize(), min_value=0, value=val, key=f"inp_{key}")
-            if st.session_state.get(f"inp_{key}") != val:
-                st.session_state.modified = True
-    practice_df = pd.DataFrame({"Type": ["Family", "Internal", "General"], "Count": list(practice_vals.values())})
-    fig = px.bar(practice_df, x="Count", y="Type", orientation="h", text="Count")
-    fig.update_layout(showlegend=False, margin=dict(l=0, r=0, t=0, b=0), height=220)
-    st.plotly_chart(fig, use_container_width=True)
-
-
-def render_attendees_section(data: Dict[str, Any]):
-    st.markdown("### TOTAL ATTENDEES EDUCATED in GX")
-    curr = int(float(data.get("attendees_educated", 0)))
-    val = st.number_input("Running Total", min_value=0, value=curr, key="inp_attendees")
-    if st.session_state.get("inp_attendees") != curr:
-        st.session_state.modified = True
-
-
-def render_demographics_section(data: Dict[str, Any]):
-    st.markdown("#### Demographics")
-    demo_keys = ["demo_black", "demo_hispanic", "demo_white", "demo_other"]
-    labels = ["Black %", "Hispanic %", "White %", "Other %"]
-    demo_vals = {}
-    cols = st.columns(4)
-    for key, label, col in zip(demo_keys, labels, cols):
-        with col:
-            val = int(float(data.get(key, 0)))
-            demo_vals[key] = st.number_input(label, min_value=0, max_value=100, value=val, key=f"inp_{key}")
-            if st.session_state.get(f"inp_{key}") != val:
-                st.session_state.modified = True
-
-    df = pd.DataFrame({"Group": ["Black/African American", "Hispanic/Latino", "White/Caucasian", "Other"], "Percent": list(demo_vals.values())})
-    total = df["Percent"].sum()
-    if total != 100 and total > 0:
-        st.warning(f"Sum: {total}%. Normalizing...")
-        df["Percent"] = (df["Percent"] / total * 100).round(1)
-    fig = px.bar(df, x="Percent", y="Group", orientation="h", text="Percent")
-    fig.update_layout(showlegend=False, margin=dict(l=0, r=0, t=0, b=0), height=240)
-    st.plotly_chart(fig, use_container_width=True)
-
-
-def render_age_gender_section(data: Dict[str, Any]):
-    col_age, col_gender = st.columns(2)
-    with col_age:
-        st.markdown("**Age Distribution**")
-        age_keys = ["age_55_plus", "age_35_54", "age_18_34"]
-        age_labels = ["55+ yrs", "35-54 yrs", "18-34 yrs"]
-        age_vals = {}
-        for key, label in zip(age_keys, age_labels):
-            val = int(float(data.get(key, 0)))
-            age_vals[key] = st.number_input(label, min_value=0, value=val, key=f"inp_{key}")
-            if st.session_state.get(f"inp_{key}") != val:
-                st.session_state.modified = True
-        age_df = pd.DataFrame({"Age": age_labels, "Count": list(age_vals.values())})
-        fig = px.pie(age_df, values="Count", names="Age", hole=0.4)
-        fig.update_traces(textposition="inside", textinfo="percent+label")
-        fig.update_layout(height=420, margin=dict(l=20, r=20, t=20, b=20))
-        st.plotly_chart(fig, use_container_width=False)
-
-    with col_gender:
-        st.markdown("**Gender**")
-        male_val = int(float(data.get("gender_male", 0)))
-        male = st.number_input("Male %", min_value=0, max_value=100, value=male_val, key="inp_gender_male")
-        if st.session_state.get("inp_gender_male") != male_val:
-            st.session_state.modified = True
-        female = max(0, 100 - male)
-        fig = px.pie(values=[male, female], names=["Male", "Female"], hole=0.4)
-        fig.update_traces(textposition="inside", textinfo="percent+label")
-        fig.update_layout(height=420, margin=dict(l=20, r=20, t=20, b=20))
-        st.plotly_chart(fig, use_container_width=False)
-
-
-def render_knowledge_intent_section(data: Dict[str, Any]):
-    st.markdown("#### Knowledge / Intent")
-    col1, col2, col3, col4 = st.columns(4)
-    metric_info = [
-        ("aware_ldlc", "LDL-c Awareness"),
-        ("understand_risk", "LDL-c Risk Understanding"),
-        ("intent_test", "Intent to Test"),
-        ("intent_followup", "Intent to Follow-up"),
-    ]
-    for (key, label), col in zip(metric_info, [col1, col2, col3, col4]):
-        with col:
-            val = int(float(data.get(key, 0)))
-            rv = st.number_input(label + " %", min_value=0, max_value=100, value=val, key=f"inp_{key}")
-            if st.session_state.get(f"inp_{key}") != val:
-                st.session_state.modified = True
-            render_metric_card(label, rv)
-
-
-def render_ldlc_matrix(data: Dict[str, Any]):
-    st.markdown("#### LDL-c (mg/dL) Distribution")
-    rows = [
-        ["0-54", float(data.get("ldlc_0_54", 0))],
-        ["55-70", float(data.get("ldlc_55_70", 0))],
-        ["70-99", float(data.get("ldlc_70_99", 0))],
-        ["100-139", float(data.get("ldlc_100_139", 0))],
-        ["140-189", float(data.get("ldlc_140_189", 0))],
-        [">=190", float(data.get("ldlc_190_plus", 0))],
-    ]
-    matrix = pd.DataFrame(rows, columns=["Range", "Value"])
-
-    gb = AgGrid(
-        matrix,
-        editable=True,
-        fit_columns_on_grid_load=True,
-        height=220,
-        update_mode=GridUpdateMode.MODEL_CHANGED,
-        data_return_mode=DataReturnMode.AS_INPUT,
-    )
-    edited = pd.DataFrame(gb["data"])
-    # Normalize to 100 if needed
-    total = edited["Value"].sum()
-    if total != 100 and total > 0:
-        edited["Value"] = (edited["Value"] / total * 100).round(2)
-
-    range_to_key = {
-        "0-54": "ldlc_0_54", "55-70": "ldlc_55_70", "70-99": "ldlc_70_99",
-        "100-139": "ldlc_100_139", "140-189": "ldlc_140_189", ">=190": "ldlc_190_plus"
-    }
-    # store edited values into session state so Save button can persist them in one batch
-    for _, row in edited.iterrows():
-        key = range_to_key[row["Range"]]
-        st.session_state[f"inp_{key}"] = float(row["Value"])
-
-    st.table(edited.style.format({"Value": "{:.2f}"}))
-
-# ------------------------------
-# MAIN
-# ------------------------------
-
-def collect_changes_into_dict(original: Dict[str, Any]) -> Dict[str, Any]:
-    """Build a new data dict from original + any inputs present in session_state."""
-    out = original.copy()
-    # general keys we used with prefix inp_
-    for k in list(out.keys()):
-        sk = f"inp_{k}"
-        if sk in st.session_state:
-            # try cast numbers where appropriate
-            val = st.session_state[sk]
-            try:
-                if isinstance(out[k], int):
-                    out[k] = int(val)
-                elif isinstance(out[k], float):
-                    out[k] = float(val)
-                else:
-                    out[k] = val
-            except Exception:
-                out[k] = val
-    # hcp_educated special
-    if "hcp_educated_input" in st.session_state:
-        try:
-            out["hcp_educated"] = int(st.session_state["hcp_educated_input"])
-        except Exception:
-            pass
-    return out
-
-
-def main():
-    st.set_page_config(page_title="GX Activations Dashboard", layout="wide")
-    st.title("GX ACTIVATIONS (CITIES) – Real-time Dashboard")
-
-    # Load data (cached)
-    data = load_data_from_sheet()
-
-    # small toolbar
-    col1, col2, col3 = st.columns([4, 1, 1])
-    with col3:
-        if st.button("🔄 Reload now"):
-            load_data_from_sheet.clear()
-            st.experimental_rerun()
-    with col2:
-        auto_refresh = st.checkbox("Auto-refresh 30s", value=True)
-
-    # Auto refresh logic (non-blocking) — stores last refresh time in session_state
-    if auto_refresh:
-        last = st.session_state.get("last_refresh", 0)
-        if time.time() - last > 30:
-            st.session_state.last_refresh = time.time()
-            load_data_from_sheet.clear()
-            # don't immediately rerun to avoid infinite loops, but update 'data' ref
-            data = load_data_from_sheet()
-
-    # track whether user has made any edits
-    if "modified" not in st.session_state:
-        st.session_state.modified = False
-
-    # Render sections
-    st.markdown("---")
-    render_hcp_section(data)
-    st.markdown("---")
-    render_attendees_section(data)
-    render_demographics_section(data)
-    render_age_gender_section(data)
-    render_knowledge_intent_section(data)
-    st.markdown("---")
-    render_ldlc_matrix(data)
-
-    st.markdown("---")
-    cols = st.columns([1, 1, 1, 6])
-    save_col, reset_col, info_col, _ = cols
-
-    with save_col:
-        if st.button("💾 Save to Google Sheets"):
-            new_data = collect_changes_into_dict(data)
-            success = save_data_to_sheet(new_data)
-            if success:
-                st.success("✅ Data saved successfully!")
-                st.session_state.modified = False
-                # refresh cached data
-                load_data_from_sheet.clear()
-    with reset_col:
-        if st.button("↺ Reset (discard local edits)"):
-            # clear input keys we created
-            keys_to_remove = [k for k in st.session_state.keys() if k.startswith("inp_") or k == "hcp_educated_input"]
-            for k in keys_to_remove:
-                del st.session_state[k]
-            st.session_state.modified = False
-            load_data_from_sheet.clear()
-            st.experimental_rerun()
-
-    # Inform user about unsaved changes
-    if st.session_state.modified:
-        st.warning("You have unsaved changes. Click 'Save to Google Sheets' to persist them.")
-
-    # Debug / admin: show loaded secrets present (do not show in public)
-    if st.sidebar.checkbox("Show debug info"):
-        st.sidebar.write("Loaded data keys:", list(data.keys()))
-        st.sidebar.write("st.secrets contains gcp_service_account:", "gcp_service_account" in st.secrets)
-
-
-if __name__ == "__main__":
-    main()
-
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import numpy as np
+import pandas as pd
+import time
+import os
+import json
+import string
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Dict, Any
+
+# Third-party dependencies that must appear in requirements.txt
+import gspread
+from streamlit_autorefresh import st_autorefresh
+from google.oauth2.service_account import Credentials
+from google.auth.transport.requests import AuthorizedSession
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# ------------------------------
+# CONFIG / CONSTANTS
+# ------------------------------
+SHEET_ID = "1IHHtOFCFs6SdE88L3ZrUfbg_rmXgF8kHrhbmE4Yk3Y0"
+WORKSHEET_NAME = "GX Dashboard Data"
+# bundled seed values, used when Google Sheets is unreachable
+SEED_FILE = "gx_dashboard_data.csv"
+
+DEFAULT_DATA = {
+    "hcp_educated": 28, "hcp_family": 19, "hcp_internal": 18, "hcp_general": 28,
+    "hcp_md_do": 75, "hcp_np_pa": 25,
+    "confidence_diagnosing": 85, "confidence_treating": 78, "confidence_managing": 82,
+    "intent_to_test": 90,
+    "attendees_educated": 98,
+    "demo_black": 55, "demo_hispanic": 25, "demo_white": 17, "demo_other": 3,
+    "age_55_plus": 45, "age_35_54": 28, "age_18_34": 27,
+    "gender_male": 75,
+    "aware_ldlc": 88, "understand_risk": 84, "intent_test": 91, "intent_followup": 79,
+    "ldlc_0_54": 0.54, "ldlc_55_70": 0.70, "ldlc_70_99": 0.99,
+    "ldlc_100_139": 1.39, "ldlc_140_189": 1.89, "ldlc_190_plus": 1.90,
+}
+
+# per-key target type, derived once from the defaults (used when collecting edits)
+_TYPES = {k: type(v) for k, v in DEFAULT_DATA.items()}
+
+NUMERIC_KEYS = tuple(DEFAULT_DATA)
+
+# chart category labels, built once instead of per figure build
+DEMO_GROUPS = ("Black/African American", "Hispanic/Latino", "White/Caucasian", "Other")
+AGE_BANDS = ("55+ yrs", "35-54 yrs", "18-34 yrs")
+
+# LDL-c matrix rows: display range label -> data key, built once
+LDLC_RANGES = ("0-54", "55-70", "70-99", "100-139", "140-189", ">=190")
+LDLC_KEYS = ("ldlc_0_54", "ldlc_55_70", "ldlc_70_99", "ldlc_100_139", "ldlc_140_189", "ldlc_190_plus")
+RANGE_TO_KEY = dict(zip(LDLC_RANGES, LDLC_KEYS))
+
+# (widget key, data key) pairs scanned once per rerun for pending edits;
+# hcp_educated and attendees_educated use non-standard widget keys, and the
+# LDL-c matrix manages its own session-state entries
+_WIDGET_KEYS = tuple(
+    {"hcp_educated": ("hcp_educated_input", "hcp_educated"),
+     "attendees_educated": ("inp_attendees", "attendees_educated")}.get(k, (f"inp_{k}", k))
+    for k in NUMERIC_KEYS if not k.startswith("ldlc_")
+)
+
+# data key -> widget key for the save path; LDL-c keys follow the inp_ rule
+_WIDGET_FOR = {dkey: skey for skey, dkey in _WIDGET_KEYS}
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    # read-only Drive metadata, used for cache invalidation via modifiedTime
+    "https://www.googleapis.com/auth/drive.metadata.readonly",
+]
+
+# ------------------------------
+# AUTH / GSPREAD HELPERS
+# ------------------------------
+
+def _creds_from_st_secrets() -> Credentials | None:
+    """Return google Credentials object from st.secrets if available."""
+    try:
+        if "gcp_service_account" in st.secrets:
+            sa = st.secrets["gcp_service_account"]
+            # st.secrets might return a TOML-like mapping or a JSON string
+            if isinstance(sa, str):
+                sa = json.loads(sa)
+            creds = Credentials.from_service_account_info(sa, scopes=SCOPES)
+            return creds
+    except Exception as e:
+        st.error(f"Error parsing st.secrets gcp_service_account: {e}")
+    return None
+
+
+def _creds_from_file_env() -> Credentials | None:
+    """Try loading credentials from GOOGLE_APPLICATION_CREDENTIALS env var or local file.
+    Returns None if no usable file was found.
+    """
+    json_path = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS", "service_account.json")
+    if not os.path.exists(json_path):
+        return None
+    try:
+        creds = Credentials.from_service_account_file(json_path, scopes=SCOPES)
+        return creds
+    except Exception as e:
+        st.error(f"Failed loading credentials from file {json_path}: {e}")
+        return None
+
+
+def _pooled_session(creds: Credentials) -> AuthorizedSession:
+    """Build an AuthorizedSession with connection pooling and retry on transient errors.
+
+    Reusing one keep-alive HTTPS connection avoids a fresh TLS handshake per
+    Sheets call; the Retry adapter also backs off on 429 rate limits.
+    """
+    session = AuthorizedSession(creds)
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503]),
+    )
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_resource(show_spinner=False)
+def get_gspread_client() -> gspread.Client:
+    """Return an authorized gspread client backed by a pooled session.
+
+    Built once per process (st.cache_resource) so reruns skip re-reading
+    secrets, RSA key setup and client construction.
+
+    Priority:
+    1) st.secrets['gcp_service_account'] (recommended for Streamlit Cloud)
+    2) GOOGLE_APPLICATION_CREDENTIALS env var or service_account.json (local/dev)
+    """
+    # 1) try st.secrets
+    creds = _creds_from_st_secrets()
+    if creds is None:
+        # 2) try env / local file
+        creds = _creds_from_file_env()
+    if creds is not None:
+        return gspread.Client(auth=creds, session=_pooled_session(creds))
+
+    # 3) nothing worked
+    raise RuntimeError("No Google service account credentials found. Add credentials to st.secrets or set GOOGLE_APPLICATION_CREDENTIALS to a local JSON file.")
+
+# ------------------------------
+# DATA IO
+# ------------------------------
+
+@st.cache_data(show_spinner=False)
+def _load_seed_cached(mtime: float) -> Dict[str, Any]:
+    """Parse the seed CSV; cached on the file's mtime so an unchanged file
+    is parsed once per process."""
+    out = DEFAULT_DATA.copy()
+    try:
+        if mtime:
+            df = pd.read_csv(SEED_FILE, header=None, names=["key", "value"])
+            # mask both columns so a non-numeric row drops its key too,
+            # instead of shifting every later key onto the wrong value
+            nums = pd.to_numeric(df["value"], errors="coerce")
+            valid = nums.notna()
+            out.update(dict(zip(df["key"][valid], nums[valid])))
+    except Exception:
+        pass
+    return out
+
+
+def _load_seed_data() -> Dict[str, Any]:
+    """Return DEFAULT_DATA overlaid with the bundled seed CSV, if present.
+
+    The seed file is two columns (key, value) with no header; values are
+    coerced in one vectorized pass. Returns a copy so callers cannot mutate
+    the cached dict.
+    """
+    try:
+        mtime = os.path.getmtime(SEED_FILE)
+    except OSError:
+        mtime = 0.0
+    return dict(_load_seed_cached(mtime))
+
+
+@st.cache_resource(show_spinner=False)
+def _io_executor() -> ThreadPoolExecutor:
+    """Single shared worker for Sheets I/O, so fetches overlap rendering."""
+    return ThreadPoolExecutor(max_workers=1)
+
+
+def _fetch_data_async():
+    """Submit the revision check + sheet fetch on the worker thread.
+
+    The caller's ScriptRunContext is attached to the worker first, so any
+    st.error emitted from the load path still renders instead of being
+    dropped with a "missing ScriptRunContext" warning.
+    """
+    ctx = get_script_run_ctx()
+
+    def _task():
+        add_script_run_ctx(ctx=ctx)
+        return load_data_from_sheet(_sheet_revision())
+
+    return _io_executor().submit(_task)
+
+
+def _sheet_revision() -> str:
+    """Return the sheet's Drive modifiedTime, used as a cache key.
+
+    A metadata read is cheap (not counted against write quota) and lets the
+    data cache hit precisely until someone edits the sheet. Falls back to a
+    60-second time bucket if the metadata call fails.
+    """
+    try:
+        client = get_gspread_client()
+        session = getattr(client, "session", None) or client.http_client.session
+        resp = session.get(
+            f"https://www.googleapis.com/drive/v3/files/{SHEET_ID}",
+            params={"fields": "modifiedTime"},
+            timeout=10,
+        )
+        resp.raise_for_status()
+        return resp.json()["modifiedTime"]
+    except Exception:
+        return str(int(time.time() // 60))
+
+
+@st.cache_data(show_spinner=False)
+def load_data_from_sheet(rev: str) -> Dict[str, Any]:
+    """Load key/value pairs from Google Sheet.
+
+    Cached per sheet revision (``rev`` from :func:`_sheet_revision`), so the
+    cache is invalidated exactly when the sheet changes rather than on a
+    timer. Raises on API/auth errors — st.cache_data never stores a failed
+    call, so the fallback handling belongs to the caller.
+    """
+    client = get_gspread_client()
+    sh = client.open_by_key(SHEET_ID)
+    # Single values.batchGet call (skips the header row via the range)
+    payload = sh.values_batch_get(ranges=[f"{WORKSHEET_NAME}!A2:B"])
+    values = payload["valueRanges"][0].get("values", [])
+    rows = [row for row in values if len(row) >= 2 and row[0] != ""]
+    if not rows:
+        return _load_seed_data()
+
+    df = pd.DataFrame(rows, columns=["key", "value"])
+    # vectorized numeric coercion; non-numeric cells keep their raw string
+    nums = pd.to_numeric(df["value"], errors="coerce")
+    parsed = nums.where(nums.notna(), df["value"])
+    # combine with defaults for missing keys
+    return {**DEFAULT_DATA, **dict(zip(df["key"], parsed))}
+
+
+def _is_rate_limit(exc: BaseException) -> bool:
+    """True for a Sheets 429; anything else should not be retried."""
+    return isinstance(exc, gspread.exceptions.APIError) and exc.response.status_code == 429
+
+
+@retry(retry=retry_if_exception(_is_rate_limit), wait=wait_exponential_jitter(initial=1, max=8),
+       stop=stop_after_attempt(4), reraise=True)
+def _write_rows(rows) -> None:
+    """Push rows to the sheet, retrying 429s with jittered exponential backoff."""
+    client = get_gspread_client()
+    sh = client.open_by_key(SHEET_ID)
+    # One values.batchUpdate for the new rows; batchUpdate only writes the
+    # cells supplied, so the open-ended tail needs an explicit batchClear or
+    # rows left over from a previously larger key set would survive.
+    sh.values_batch_update(body={
+        "valueInputOption": "RAW",
+        "data": [{"range": f"{WORKSHEET_NAME}!A1:B{len(rows)}", "values": rows}],
+    })
+    sh.values_batch_clear(body={"ranges": [f"{WORKSHEET_NAME}!A{len(rows) + 1}:B"]})
+
+
+def save_data_to_sheet(data: Dict[str, Any]) -> bool:
+    """Save the provided dict to Google Sheet as two-column rows (key, value).
+
+    This function writes all rows in a single batch update for speed, with
+    transient 429 rate limits retried transparently.
+    Returns True on success, False on failure.
+    """
+    try:
+        _write_rows([["key", "value"]] + [[k, str(v)] for k, v in data.items()])
+        # Invalidate cache
+        load_data_from_sheet.clear()
+        return True
+    except Exception as e:
+        st.error(f"⚠️ Could not save data to Google Sheets: {e}")
+        return False
+
+# ------------------------------
+# UI HELPERS
+# ------------------------------
+
+# static charts: no modebar, no JS interactivity, smaller payloads
+_PLOT_CONFIG = {"staticPlot": True, "displayModeBar": False}
+
+# card markup tokenized once at import; substitute() only fills the slots
+_CARD_TPL = string.Template("""
+        <div style='text-align:center; background-color:$bg; border-radius:12px; padding:14px; margin:8px 0; min-height:120px; display:flex; flex-direction:column; justify-content:center; align-items:center;'>
+            <div style='font-size:13px; color:#444; font-weight:600; margin-bottom:6px;'>$label</div>
+            <div style='font-size:32px; font-weight:bold; color:$color;'>$value%</div>
+        </div>
+    """)
+
+
+@lru_cache(maxsize=256)
+def _metric_html(label: str, value: Any, color: str, bg_color: str) -> str:
+    """Format a metric card. Memoized — the small set of (label, value, color)
+    tuples repeats across reruns, so steady-state calls are dict lookups."""
+    return _CARD_TPL.substitute(label=label, value=value, color=color, bg=bg_color)
+
+
+def render_metric_card(label: str, value: Any, color: str = "#1f77b4", bg_color: str = "#f0f8ff"):
+    st.markdown(_metric_html(label, value, color, bg_color), unsafe_allow_html=True)
+
+
+def render_metric_row(cards):
+    """Render several metric cards as one flex row in a single markdown call.
+
+    Emits one element (one forward message to the browser) instead of an
+    st.columns container plus one markdown per card.
+    """
+    html = "<div style='display:flex; gap:12px;'>" + "".join(
+        f"<div style='flex:1;'>{_metric_html(label, value, color, bg)}</div>"
+        for label, value, color, bg in cards
+    ) + "</div>"
+    st.markdown(html, unsafe_allow_html=True)
+
+
+def _sync_dirty(v: SimpleNamespace) -> None:
+    """Recompute pending edits in one pass over the widget/data key pairs.
+
+    Pending edits accumulate in st.session_state['_dirty'] and are flushed in a
+    single save_data_to_sheet call by the Save button — never per widget.
+    """
+    state = st.session_state
+    dirty = state.setdefault("_dirty", set())
+    for skey, dkey in _WIDGET_KEYS:
+        val = state.get(skey)
+        if val is not None and val != getattr(v, dkey):
+            dirty.add(skey)
+    if dirty:
+        state.modified = True
+
+# ------------------------------
+# FIGURE BUILDERS (cached)
+# ------------------------------
+
+@st.cache_data(show_spinner=False)
+def _practice_fig(family: int, internal: int, general: int):
+    """Horizontal bar of practice-type counts, as a plain figure dict.
+
+    Cached on the three ints; the dict form keeps cache serialisation and
+    copy-on-retrieval trivial compared to a go.Figure.
+    """
+    import plotly.graph_objects as go  # deferred: only paid on a cache miss
+    counts = [family, internal, general]
+    fig = go.Figure(go.Bar(x=counts, y=["Family", "Internal", "General"], orientation="h", text=counts))
+    fig.update_layout(showlegend=False, margin=dict(l=0, r=0, t=0, b=0), height=220)
+    return fig.to_dict()
+
+
+@st.cache_data(show_spinner=False)
+def _demo_fig(percents: tuple):
+    """Horizontal bar of demographic percentages. Cached on the value tuple."""
+    import plotly.graph_objects as go  # deferred: only paid on a cache miss
+    fig = go.Figure(go.Bar(x=list(percents), y=list(DEMO_GROUPS), orientation="h", text=list(percents)))
+    fig.update_layout(showlegend=False, margin=dict(l=0, r=0, t=0, b=0), height=240)
+    return fig.to_dict()
+
+
+@st.cache_data(show_spinner=False)
+def _age_fig(counts: tuple):
+    """Donut of age-band counts. Cached on the value tuple."""
+    import plotly.graph_objects as go  # deferred: only paid on a cache miss
+    fig = go.Figure(go.Pie(values=list(counts), labels=list(AGE_BANDS), hole=0.4,
+                           textposition="inside", textinfo="percent+label"))
+    fig.update_layout(height=420, margin=dict(l=20, r=20, t=20, b=20))
+    return fig.to_dict()
+
+
+@st.cache_data(show_spinner=False)
+def _gender_fig(male: int):
+    """Donut of male/female split. Cached on the male percentage."""
+    import plotly.graph_objects as go  # deferred: only paid on a cache miss
+    female = max(0, 100 - male)
+    fig = go.Figure(go.Pie(values=[male, female], labels=["Male", "Female"], hole=0.4,
+                           textposition="inside", textinfo="percent+label"))
+    fig.update_layout(height=420, margin=dict(l=20, r=20, t=20, b=20))
+    return fig.to_dict()
+
+# ------------------------------
+# SECTION RENDERS
+# ------------------------------
+
+def _memoize_section(name: str, inputs: tuple, build):
+    """Return the last figure built for a section, rebuilding only on change.
+
+    Keeps one (input-hash, figure) pair per section in session_state. This
+    complements the st.cache_data builders: on unchanged reruns even the
+    cache lookup (and its copy-on-retrieval) is skipped.
+    """
+    h = hash(inputs)
+    cache = st.session_state.setdefault("_sec", {})
+    if cache.get(name, (None, None))[0] != h:
+        cache[name] = (h, build())
+    return cache[name][1]
+
+
+def _typed_values(data: Dict[str, Any]) -> SimpleNamespace:
+    """Precompute int/float casts for all known keys once per render pass.
+
+    Each section previously repeated int(float(data.get(k, 0))) per widget and
+    per card. LDL-c keys stay float; everything else is int.
+    """
+    return SimpleNamespace(**{
+        k: (float(data.get(k, 0)) if k.startswith("ldlc_") else int(float(data.get(k, 0))))
+        for k in NUMERIC_KEYS
+    })
+
+
+def render_hcp_section(v: SimpleNamespace):
+    st.markdown("### TOTAL HCPs EDUCATED in GX")
+    hcp_val = v.hcp_educated
+    new_hcp = st.number_input("Running Total", min_value=0, value=hcp_val, key="hcp_educated_input")
+    render_metric_row([
+        ("Confidence<br>Diagnosing", v.confidence_diagnosing, "#1f77b4", "#f0f8ff"),
+        ("Confidence<br>Treating", v.confidence_treating, "#ff7f0e", "#fff8f0"),
+        ("Confidence<br>Managing", v.confidence_managing, "#2ca02c", "#f0fff0"),
+        ("Intent<br>to Test", v.intent_to_test, "#d62728", "#fff0f0"),
+    ])
+
+    st.markdown("#### Practice Type")
+    cols = st.columns(3)
+    keys = ["hcp_family", "hcp_internal", "hcp_general"]
+    practice_vals = {}
+    for key, col in zip(keys, cols):
+        with col:
+            val = getattr(v, key)
+            practice_vals[key] = st.number_input(key.replace("hcp_", "").capitalize(), min_value=0, value=val, key=f"inp_{key}")
+    inputs = tuple(practice_vals.values())
+    fig = _memoize_section("practice", inputs, lambda: _practice_fig(*inputs))
+    st.plotly_chart(fig, use_container_width=True, theme=None, config=_PLOT_CONFIG)
+
+
+def render_attendees_section(v: SimpleNamespace):
+    st.markdown("### TOTAL ATTENDEES EDUCATED in GX")
+    curr = v.attendees_educated
+    val = st.number_input("Running Total", min_value=0, value=curr, key="inp_attendees")
+
+
+def render_demographics_section(v: SimpleNamespace):
+    st.markdown("#### Demographics")
+    demo_keys = ["demo_black", "demo_hispanic", "demo_white", "demo_other"]
+    labels = ["Black %", "Hispanic %", "White %", "Other %"]
+    demo_vals = {}
+    cols = st.columns(4)
+    for key, label, col in zip(demo_keys, labels, cols):
+        with col:
+            val = getattr(v, key)
+            demo_vals[key] = st.number_input(label, min_value=0, max_value=100, value=val, key=f"inp_{key}")
+
+    percents = np.asarray(list(demo_vals.values()), dtype=np.float64)
+    total = percents.sum()
+    if total != 100 and total > 0:
+        st.warning(f"Sum: {total:g}%. Normalizing...")
+        percents = np.round(percents / total * 100, 1)
+    inputs = tuple(percents)
+    fig = _memoize_section("demo", inputs, lambda: _demo_fig(inputs))
+    st.plotly_chart(fig, use_container_width=True, theme=None, config=_PLOT_CONFIG)
+
+
+def render_age_gender_section(v: SimpleNamespace):
+    col_age, col_gender = st.columns(2)
+    with col_age:
+        st.markdown("**Age Distribution**")
+        age_keys = ["age_55_plus", "age_35_54", "age_18_34"]
+        age_labels = AGE_BANDS
+        age_vals = {}
+        for key, label in zip(age_keys, age_labels):
+            val = getattr(v, key)
+            age_vals[key] = st.number_input(label, min_value=0, value=val, key=f"inp_{key}")
+        inputs = tuple(age_vals.values())
+        fig = _memoize_section("age", inputs, lambda: _age_fig(inputs))
+        st.plotly_chart(fig, use_container_width=False, theme=None, config=_PLOT_CONFIG)
+
+    with col_gender:
+        st.markdown("**Gender**")
+        male_val = v.gender_male
+        male = st.number_input("Male %", min_value=0, max_value=100, value=male_val, key="inp_gender_male")
+        fig = _memoize_section("gender", (male,), lambda: _gender_fig(male))
+        st.plotly_chart(fig, use_container_width=False, theme=None, config=_PLOT_CONFIG)
+
+
+def render_knowledge_intent_section(v: SimpleNamespace):
+    st.markdown("#### Knowledge / Intent")
+    col1, col2, col3, col4 = st.columns(4)
+    metric_info = [
+        ("aware_ldlc", "LDL-c Awareness"),
+        ("understand_risk", "LDL-c Risk Understanding"),
+        ("intent_test", "Intent to Test"),
+        ("intent_followup", "Intent to Follow-up"),
+    ]
+    cards = []
+    for (key, label), col in zip(metric_info, [col1, col2, col3, col4]):
+        with col:
+            val = getattr(v, key)
+            rv = st.number_input(label + " %", min_value=0, max_value=100, value=val, key=f"inp_{key}")
+            cards.append((label, rv, "#1f77b4", "#f0f8ff"))
+    render_metric_row(cards)
+
+
+def render_ldlc_matrix(v: SimpleNamespace):
+    st.markdown("#### LDL-c (mg/dL) Distribution")
+    matrix = pd.DataFrame({"Range": LDLC_RANGES, "Value": [getattr(v, k) for k in LDLC_KEYS]})
+
+    edited = st.data_editor(
+        matrix,
+        num_rows="fixed",
+        use_container_width=True,
+        key="ldlc_editor",
+        column_config={
+            "Range": st.column_config.TextColumn(disabled=True),
+            "Value": st.column_config.NumberColumn(format="%.2f", min_value=0.0),
+        },
+    )
+    # Normalize to 100 if needed
+    vals = edited["Value"].to_numpy(dtype=float)
+    total = vals.sum()
+    if total != 100 and total > 0:
+        edited["Value"] = np.round(vals / total * 100, 2)
+
+    # accumulate edits, then store into session state in one update so the
+    # Save button can persist them in one batch
+    updates = dict(zip(
+        "inp_" + edited["Range"].map(RANGE_TO_KEY),
+        edited["Value"].to_numpy(dtype=float),
+    ))
+    st.session_state.update(updates)
+
+    st.table(edited.style.format({"Value": "{:.2f}"}))
+
+# ------------------------------
+# MAIN
+# ------------------------------
+
+def _cast(t: type, val: Any) -> Any:
+    """Cast val to t, returning val unchanged if the cast fails."""
+    try:
+        return t(val)
+    except Exception:
+        return val
+
+
+def collect_changes_into_dict(original: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a new data dict from original + any inputs present in session_state.
+
+    Widget keys come from the same table dirty tracking uses (_WIDGET_FOR),
+    so the non-standard ones — hcp_educated_input, inp_attendees — are
+    collected too; values are cast to the type from DEFAULT_DATA.
+    """
+    return {
+        k: _cast(_TYPES.get(k, type(v)), st.session_state[sk])
+        if (sk := _WIDGET_FOR.get(k, f"inp_{k}")) in st.session_state else v
+        for k, v in original.items()
+    }
+
+
+def main():
+    st.set_page_config(page_title="GX Activations Dashboard", layout="wide")
+    st.title("GX ACTIVATIONS (CITIES) – Real-time Dashboard")
+
+    # Kick off the sheet fetch (cached per revision) on the worker thread so
+    # the network round-trip overlaps the toolbar rendering below.
+    data_future = _fetch_data_async()
+
+    # small toolbar
+    col1, col2, col3 = st.columns([4, 1, 1])
+    with col3:
+        if st.button("🔄 Reload now"):
+            load_data_from_sheet.clear()
+            st.experimental_rerun()
+    with col2:
+        auto_refresh = st.checkbox("Auto-refresh 30s", value=True)
+
+    # Auto refresh: schedule a client-side rerun every 30 s (non-blocking).
+    # The revision-keyed cache keeps those reruns cheap unless the sheet
+    # actually changed.
+    if auto_refresh:
+        st_autorefresh(interval=30_000, key="auto_refresh")
+
+    # track whether user has made any edits
+    if "modified" not in st.session_state:
+        st.session_state.modified = False
+
+    try:
+        data = data_future.result()
+    except Exception as e:
+        st.error(f"⚠️ Could not load data from Google Sheets: {e}")
+        data = _load_seed_data()
+
+    # Render sections (casts precomputed once for the whole pass)
+    v = _typed_values(data)
+    st.markdown("---")
+    render_hcp_section(v)
+    st.markdown("---")
+    render_attendees_section(v)
+    render_demographics_section(v)
+    render_age_gender_section(v)
+    render_knowledge_intent_section(v)
+    st.markdown("---")
+    render_ldlc_matrix(v)
+
+    # one comparison pass over all widgets instead of a check per widget
+    _sync_dirty(v)
+
+    st.markdown("---")
+    cols = st.columns([1, 1, 1, 6])
+    save_col, reset_col, info_col, _ = cols
+
+    with save_col:
+        if st.button("💾 Save to Google Sheets"):
+            new_data = collect_changes_into_dict(data)
+            success = save_data_to_sheet(new_data)
+            if success:
+                st.success("✅ Data saved successfully!")
+                st.session_state.modified = False
+                st.session_state.pop("_dirty", None)
+                # refresh cached data
+                load_data_from_sheet.clear()
+    with reset_col:
+        if st.button("↺ Reset (discard local edits)"):
+            # clear input keys we created
+            keys_to_remove = [k for k in st.session_state.keys() if k.startswith("inp_") or k == "hcp_educated_input"]
+            for k in keys_to_remove:
+                del st.session_state[k]
+            st.session_state.modified = False
+            st.session_state.pop("_dirty", None)
+            load_data_from_sheet.clear()
+            st.experimental_rerun()
+
+    # Inform user about unsaved changes
+    if st.session_state.modified:
+        st.warning("You have unsaved changes. Click 'Save to Google Sheets' to persist them.")
+
+    # Debug / admin: show loaded secrets present (do not show in public)
+    if st.sidebar.checkbox("Show debug info"):
+        st.sidebar.write("Loaded data keys:", list(data.keys()))
+        st.sidebar.write("st.secrets contains gcp_service_account:", "gcp_service_account" in st.secrets)
+
+
+if __name__ == "__main__":
+    main()
+